@@ -1,9 +1,14 @@
 import os
-import re
+import atexit
+import logging
+import logging.handlers
+import queue
+import string
+import time
 import asyncio
 import sqlite3
-from dataclasses import dataclass
-from typing import Optional
+import threading
+from typing import NamedTuple, Optional
 
 import aiohttp
 import discord
@@ -17,14 +22,44 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Handlers only enqueue records; a listener thread does the actual stream I/O
+# so logging never blocks the event loop.
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(
+    _log_queue, logging.StreamHandler(), respect_handler_level=True
+)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    handlers=[logging.handlers.QueueHandler(_log_queue)],
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+log = logging.getLogger("mcbot")
+
 TOKEN = os.getenv("DISCORD_TOKEN")
 if not TOKEN:
     raise RuntimeError("Missing DISCORD_TOKEN in .env")
 
 CHECK_INTERVAL_MINUTES = int(os.getenv("CHECK_INTERVAL_MINUTES", "5"))
+# The watch loop never runs more often than every 5 minutes.
+WATCH_INTERVAL_MINUTES = max(5, CHECK_INTERVAL_MINUTES)
 DB_PATH = os.path.join("data", "watches.db")
 
-MC_NAME_RE = re.compile(r"^[a-zA-Z0-9_]{3,16}$")
+# Taken names rarely free up; once confirmed taken, skip re-checking them for
+# this many ticks. This trades alert latency for fewer Mojang requests: a name
+# that frees up can be reported up to (TAKEN_SKIP_TICKS - 1) intervals late.
+# The default of 1 disables skipping.
+TAKEN_SKIP_TICKS = int(os.getenv("TAKEN_SKIP_TICKS", "1"))
+
+# With nothing to watch, the loop's wait grows 4x per idle tick up to this cap.
+IDLE_MAX_MINUTES = 30
+
+_MC_NAME_CHARS = frozenset(string.ascii_letters + string.digits + "_")
+
+def is_valid_mc(name: str) -> bool:
+    return 3 <= len(name) <= 16 and not (set(name) - _MC_NAME_CHARS)
 
 os.makedirs("data", exist_ok=True)
 
@@ -32,12 +67,26 @@ os.makedirs("data", exist_ok=True)
 # DATABASE
 # ─────────────────────────────
 
-def db_connect():
-    return sqlite3.connect(DB_PATH)
+# One connection for the process lifetime, opened in db_init(). Autocommit mode
+# (isolation_level=None), so every statement commits on its own.
+_CON: Optional[sqlite3.Connection] = None
+_LOCK = threading.Lock()
+
+# All statements in one place for readability. (sqlite3's statement cache is
+# keyed by SQL text, so this doesn't change caching; the long-lived connection
+# is what makes the cache effective.)
+_SQL_ADD = "INSERT OR IGNORE INTO watches (guild_id, channel_id, mc_name, last_status) VALUES (?, ?, ?, 'unknown')"
+_SQL_REMOVE = "DELETE FROM watches WHERE guild_id=? AND channel_id=? AND mc_name=?"
+_SQL_LIST = "SELECT mc_name FROM watches WHERE guild_id=? AND channel_id=? ORDER BY mc_name ASC"
+_SQL_ALL = "SELECT guild_id, channel_id, mc_name, last_status FROM watches"
+_SQL_DISTINCT_NAMES = "SELECT DISTINCT mc_name FROM watches"
+_SQL_UPDATE_STATUS = "UPDATE watches SET last_status=? WHERE guild_id=? AND channel_id=? AND mc_name=?"
 
 def db_init():
-    with db_connect() as con:
-        con.execute("""
+    global _CON
+    _CON = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    with _LOCK:
+        _CON.execute("""
         CREATE TABLE IF NOT EXISTS watches (
             guild_id     INTEGER NOT NULL,
             channel_id   INTEGER NOT NULL,
@@ -46,74 +95,165 @@ def db_init():
             PRIMARY KEY (guild_id, channel_id, mc_name)
         )
         """)
-        con.execute(
-            "CREATE INDEX IF NOT EXISTS idx_watches_mc_name ON watches(mc_name)"
+        # Covering index: SELECT DISTINCT mc_name and per-name lookups of
+        # (guild, channel, status) are answered from the index alone. It
+        # supersedes the old single-column idx_watches_mc_name.
+        _CON.execute(
+            "CREATE INDEX IF NOT EXISTS idx_watches_name_gc "
+            "ON watches(mc_name, guild_id, channel_id, last_status)"
         )
-        con.commit()
+        _CON.execute("DROP INDEX IF EXISTS idx_watches_mc_name")
+        # WAL persists in the db file; the rest apply to this connection only.
+        _CON.execute("PRAGMA journal_mode=WAL")
+        _CON.execute("PRAGMA synchronous=NORMAL")
+        _CON.execute("PRAGMA temp_store=MEMORY")
+        _CON.execute("PRAGMA cache_size=-20000")
+        _CON.execute("PRAGMA mmap_size=67108864")
+        _CON.execute("ANALYZE")
 
 def db_add_watch(guild_id: int, channel_id: int, mc_name: str):
-    with db_connect() as con:
-        con.execute(
-            "INSERT OR IGNORE INTO watches (guild_id, channel_id, mc_name, last_status) VALUES (?, ?, ?, 'unknown')",
+    with _LOCK:
+        _CON.execute(
+            _SQL_ADD,
             (guild_id, channel_id, mc_name.lower())
         )
-        con.commit()
 
 def db_remove_watch(guild_id: int, channel_id: int, mc_name: str) -> int:
-    with db_connect() as con:
-        cur = con.execute(
-            "DELETE FROM watches WHERE guild_id=? AND channel_id=? AND mc_name=?",
+    with _LOCK:
+        cur = _CON.execute(
+            _SQL_REMOVE,
             (guild_id, channel_id, mc_name.lower())
         )
-        con.commit()
         return cur.rowcount
 
 def db_list_watches(guild_id: int, channel_id: int) -> list[str]:
-    with db_connect() as con:
-        cur = con.execute(
-            "SELECT mc_name FROM watches WHERE guild_id=? AND channel_id=? ORDER BY mc_name ASC",
+    with _LOCK:
+        cur = _CON.execute(
+            _SQL_LIST,
             (guild_id, channel_id)
         )
-        return [r[0] for r in cur.fetchall()]
+        return [n for (n,) in cur]
 
-@dataclass
-class WatchRow:
+class WatchRow(NamedTuple):
     guild_id: int
     channel_id: int
     mc_name: str
     last_status: str
 
 def db_get_all_watches() -> list[WatchRow]:
-    with db_connect() as con:
-        cur = con.execute(
-            "SELECT guild_id, channel_id, mc_name, last_status FROM watches"
-        )
-        return [WatchRow(*r) for r in cur.fetchall()]
-
-def db_update_status(guild_id: int, channel_id: int, mc_name: str, status: str):
-    with db_connect() as con:
-        con.execute(
-            "UPDATE watches SET last_status=? WHERE guild_id=? AND channel_id=? AND mc_name=?",
-            (status, guild_id, channel_id, mc_name.lower())
-        )
-        con.commit()
+    with _LOCK:
+        cur = _CON.execute(_SQL_ALL)
+        return list(map(WatchRow._make, cur))
+
+def db_get_distinct_names() -> list[str]:
+    with _LOCK:
+        cur = _CON.execute(_SQL_DISTINCT_NAMES)
+        return [n for (n,) in cur]
+
+def db_update_status_many(updates: list[tuple[str, int, int, str]]):
+    """Apply (status, guild_id, channel_id, mc_name) updates in one transaction."""
+    if not updates:
+        return
+    with _LOCK:
+        _CON.execute("BEGIN")
+        try:
+            _CON.executemany(
+                _SQL_UPDATE_STATUS,
+                [(status, g, c, name.lower()) for status, g, c, name in updates]
+            )
+            _CON.execute("COMMIT")
+        except BaseException:
+            # SQLite may already have rolled back on its own (e.g. SQLITE_FULL).
+            if _CON.in_transaction:
+                _CON.execute("ROLLBACK")
+            raise
 
 # ─────────────────────────────
 # MOJANG CHECK
 # ─────────────────────────────
 
+class TokenBucket:
+    """Async token bucket: `rate` tokens/second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        # Created on first use so it binds to the running loop, not whichever
+        # loop (if any) existed at import time.
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+# Mojang allows 600 requests / 10 min; average 1 req/s with a small burst.
+_mojang_limiter = TokenBucket(rate=1.0, burst=5)
+
+_MOJANG_URL = "https://api.mojang.com/users/profiles/minecraft/%s"
+_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+# Back off when Mojang answers 429/5xx; the window doubles on each failure
+# and halves on each success.
+_BACKOFF_MIN = 30.0
+_BACKOFF_MAX = 600.0
+_backoff = _BACKOFF_MIN
+_cooldown_until = 0.0
+
+# Only the status code matters, so prefer HEAD (no body). Falls back to GET
+# for good if Mojang rejects HEAD.
+_head_supported = True
+
+async def _mojang_status(session: aiohttp.ClientSession, url: str) -> int:
+    global _head_supported
+    if _head_supported:
+        async with session.head(url, timeout=_TIMEOUT) as resp:
+            if resp.status not in (405, 501):
+                return resp.status
+        _head_supported = False
+        log.info("Mojang rejected HEAD; falling back to GET")
+
+    async with session.get(url, timeout=_TIMEOUT) as resp:
+        # Drain the (small) body so the connection goes back to the pool.
+        await resp.read()
+        return resp.status
+
 async def mojang_name_exists(session: aiohttp.ClientSession, name: str) -> Optional[bool]:
-    url = f"https://api.mojang.com/users/profiles/minecraft/{name}"
+    global _backoff, _cooldown_until
+    if time.monotonic() < _cooldown_until:
+        return None
+
+    url = _MOJANG_URL % name
+    await _mojang_limiter.acquire()
     try:
-        async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
-            if resp.status == 200:
-                return True
-            if resp.status == 204:
-                return False
-            return None
+        status = await _mojang_status(session, url)
     except (aiohttp.ClientError, asyncio.TimeoutError):
         return None
 
+    if status == 429 or status >= 500:
+        _cooldown_until = time.monotonic() + _backoff
+        _backoff = min(_backoff * 2, _BACKOFF_MAX)
+        return None
+    if status == 200:
+        result = True
+    elif status == 204:
+        result = False
+    else:
+        return None
+
+    _backoff = max(_backoff / 2, _BACKOFF_MIN)
+    return result
+
 # ─────────────────────────────
 # BOT
 # ─────────────────────────────
@@ -124,63 +264,185 @@ class NameWatchBot(commands.Bot):
     def __init__(self):
         super().__init__(command_prefix="!", intents=intents)
         self.bg_task: Optional[asyncio.Task] = None
+        self.http_session: Optional[aiohttp.ClientSession] = None
+        # Caps in-flight channel.send calls; Discord limits ~5 req/s per route.
+        # Created in setup_hook alongside the stop event.
+        self._send_sem: Optional[asyncio.Semaphore] = None
+        # Created in setup_hook so it binds to the loop bot.run() starts.
+        self._stop_event: Optional[asyncio.Event] = None
+        # Set by /watch so an idle loop checks a new name without waiting out
+        # its backed-off sleep. Also created in setup_hook.
+        self._watch_added: Optional[asyncio.Event] = None
+        # mc_name -> tick at which it was last confirmed taken.
+        self._taken_seen: dict[str, int] = {}
+        self._channel_cache: dict[int, discord.abc.Messageable] = {}
 
     async def setup_hook(self):
+        # Shared by the watch loop and anything else talking to Mojang: keeps
+        # connections alive and caches DNS across many short GETs. The
+        # connector needs a running loop, so it is built here.
+        connector = aiohttp.TCPConnector(
+            limit=20, limit_per_host=10, ttl_dns_cache=300, keepalive_timeout=60
+        )
+        self.http_session = aiohttp.ClientSession(
+            connector=connector, headers={"User-Agent": "mc-name-watch-bot"}
+        )
+        self._stop_event = asyncio.Event()
+        self._watch_added = asyncio.Event()
+        self._send_sem = asyncio.Semaphore(10)
+
         self.tree.add_command(watch_cmd)
         self.tree.add_command(unwatch_cmd)
         self.tree.add_command(listwatches_cmd)
 
         await self.tree.sync()
-        print("Slash commands synced")
+        log.info("Slash commands synced")
 
         self.bg_task = asyncio.create_task(self.watch_loop())
 
+    async def close(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+        # Stop any tick in progress before the HTTP session goes away under it.
+        if self.bg_task is not None:
+            self.bg_task.cancel()
+            try:
+                await self.bg_task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                log.exception("Watch loop failed")
+        await super().close()
+        if self.http_session is not None:
+            await self.http_session.close()
+
+    # Keep the notify_change channel cache from handing out deleted channels.
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self._channel_cache.pop(channel.id, None)
+
+    async def on_raw_thread_delete(self, payload: discord.RawThreadDeleteEvent):
+        self._channel_cache.pop(payload.thread_id, None)
+
+    async def on_guild_remove(self, guild: discord.Guild):
+        stale = [
+            cid for cid, ch in self._channel_cache.items()
+            if getattr(ch, "guild", None) is not None and ch.guild.id == guild.id
+        ]
+        for cid in stale:
+            del self._channel_cache[cid]
+
     async def on_ready(self):
-        print(f"Logged in as {self.user}")
-        print(f"Bot user ID: {self.user.id}")
-        print(f"Guild count: {len(self.guilds)}")
-        print("Guilds:", [g.name for g in self.guilds])
+        log.info("Logged in as %s", self.user)
+        log.info("Bot user ID: %s", self.user.id)
+        log.info("Guild count: %d", len(self.guilds))
+        log.info("Guilds: %s", [g.name for g in self.guilds])
 
     async def watch_loop(self):
         await self.wait_until_ready()
-        interval = max(5, CHECK_INTERVAL_MINUTES)
-        print(f"Watch loop running every {interval} minutes")
-
-        async with aiohttp.ClientSession(headers={"User-Agent": "mc-name-watch-bot"}) as session:
-            while not self.is_closed():
-                rows = db_get_all_watches()
-                for row in rows:
-                    exists = await mojang_name_exists(session, row.mc_name)
-                    if exists is None:
-                        continue
-
-                    status = "taken" if exists else "available"
-                    if status != row.last_status:
-                        db_update_status(
-                            row.guild_id, row.channel_id, row.mc_name, status
-                        )
-                        await self.notify_change(
-                            row.channel_id, row.mc_name, status
-                        )
-
-                    await asyncio.sleep(1.2)
-
-                await asyncio.sleep(interval * 60)
+        interval = WATCH_INTERVAL_MINUTES
+        log.info("Watch loop running every %d minutes", interval)
+
+        tick = 0
+        wait_minutes = interval
+        while not self.is_closed():
+            tick += 1
+            # Cleared before reading, so a watch added after this point wakes us.
+            self._watch_added.clear()
+            names = db_get_distinct_names()
+            if not names:
+                self._taken_seen.clear()
+                wait_minutes = min(wait_minutes * 4, max(interval, IDLE_MAX_MINUTES))
+                await self._wait_or_stop(wait_minutes * 60, self._watch_added)
+                continue
+            wait_minutes = interval
+
+            # Look up each distinct name once, then fan out to every watch.
+            results: dict[str, bool] = {}
+            for name in names:
+                seen = self._taken_seen.get(name)
+                if seen is not None and tick - seen < TAKEN_SKIP_TICKS:
+                    results[name] = True
+                    continue
+
+                exists = await mojang_name_exists(self.http_session, name)
+                if exists is None:
+                    continue
+                results[name] = exists
+                if exists:
+                    self._taken_seen[name] = tick
+                else:
+                    self._taken_seen.pop(name, None)
+
+            for name in self._taken_seen.keys() - set(names):
+                del self._taken_seen[name]
+
+            updates: list[tuple[str, int, int, str]] = []
+            tasks: list[asyncio.Task] = []
+            notified: list[tuple[int, str]] = []
+            rows = db_get_all_watches()
+            for row in rows:
+                exists = results.get(row.mc_name)
+                if exists is None:
+                    continue
+
+                status = "taken" if exists else "available"
+                if status != row.last_status:
+                    updates.append(
+                        (status, row.guild_id, row.channel_id, row.mc_name)
+                    )
+                    tasks.append(asyncio.create_task(self.notify_change(
+                        row.channel_id, row.mc_name, status
+                    )))
+                    notified.append((row.channel_id, row.mc_name))
+
+            # SQLite blocks; run the batched write off the event loop so the
+            # notification sends already in flight keep progressing. Slash
+            # commands still take _LOCK on the loop thread, so they can stall
+            # briefly while this write holds it. If the write fails, the
+            # changes are re-detected (and re-announced) next tick.
+            try:
+                await asyncio.to_thread(db_update_status_many, updates)
+            except Exception:
+                log.exception("Failed to save %d status updates", len(updates))
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+            for (channel_id, name), res in zip(notified, outcomes):
+                if isinstance(res, BaseException):
+                    log.warning(
+                        "Failed to notify channel=%s name=%s: %r", channel_id, name, res
+                    )
+
+            await self._wait_or_stop(interval * 60)
+
+    async def _wait_or_stop(self, seconds: float, wake: Optional[asyncio.Event] = None):
+        # Wait out the interval, but wake immediately on close() or `wake`.
+        events = [self._stop_event] if wake is None else [self._stop_event, wake]
+        waiters = [asyncio.ensure_future(e.wait()) for e in events]
+        try:
+            await asyncio.wait(waiters, timeout=seconds, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for w in waiters:
+                w.cancel()
+
+    def wake_watch_loop(self):
+        if self._watch_added is not None:
+            self._watch_added.set()
 
     async def notify_change(self, channel_id: int, name: str, status: str):
-        channel = self.get_channel(channel_id)
+        channel = self._channel_cache.get(channel_id) or self.get_channel(channel_id)
         if not channel:
             return
+        self._channel_cache[channel_id] = channel
 
         if status == "available":
             msg = f"@here 🚨 **{name}** looks **AVAILABLE** right now."
         else:
             msg = f"ℹ️ **{name}** is currently taken."
 
-        try:
-            await channel.send(msg)
-        except discord.Forbidden:
-            pass
+        async with self._send_sem:
+            try:
+                await channel.send(msg)
+            except discord.Forbidden:
+                pass
 
 bot = NameWatchBot()
 
@@ -190,21 +452,22 @@ bot = NameWatchBot()
 
 @app_commands.command(name="watch", description="Watch a Minecraft username.")
 async def watch_cmd(interaction: discord.Interaction, name: str):
-    print(f"[WATCH] user={interaction.user} guild={interaction.guild_id} channel={interaction.channel_id} name={name}")
+    log.info("[WATCH] user=%s guild=%s channel=%s name=%s", interaction.user, interaction.guild_id, interaction.channel_id, name)
 
     if interaction.guild is None:
         return await interaction.response.send_message("Use this in a server.", ephemeral=True)
 
     name = name.strip()
-    if not MC_NAME_RE.match(name):
+    if not is_valid_mc(name):
         return await interaction.response.send_message("Invalid Minecraft name.", ephemeral=True)
 
     db_add_watch(interaction.guild_id, interaction.channel_id, name)
+    bot.wake_watch_loop()
     await interaction.response.send_message(f"Watching **{name}**.", ephemeral=True)
 
 @app_commands.command(name="unwatch", description="Stop watching a Minecraft username.")
 async def unwatch_cmd(interaction: discord.Interaction, name: str):
-    print(f"[UNWATCH] user={interaction.user} guild={interaction.guild_id} channel={interaction.channel_id} name={name}")
+    log.info("[UNWATCH] user=%s guild=%s channel=%s name=%s", interaction.user, interaction.guild_id, interaction.channel_id, name)
 
     removed = db_remove_watch(interaction.guild_id, interaction.channel_id, name)
     if removed:
@@ -214,7 +477,7 @@ async def unwatch_cmd(interaction: discord.Interaction, name: str):
 
 @app_commands.command(name="listwatches", description="List watched names in this channel.")
 async def listwatches_cmd(interaction: discord.Interaction):
-    print(f"[LIST] user={interaction.user} guild={interaction.guild_id} channel={interaction.channel_id}")
+    log.info("[LIST] user=%s guild=%s channel=%s", interaction.user, interaction.guild_id, interaction.channel_id)
 
     names = db_list_watches(interaction.guild_id, interaction.channel_id)
     if not names:
@@ -231,4 +494,5 @@ async def listwatches_cmd(interaction: discord.Interaction):
 
 if __name__ == "__main__":
     db_init()
-    bot.run(TOKEN)
+    # Root logging is already configured above; don't let discord.py add its own handler.
+    bot.run(TOKEN, log_handler=None)